@@ -1,83 +1,253 @@
 import os
 import io
-from datetime import datetime, timedelta
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from typing import List, Optional, Tuple
 
 import streamlit as st
-from dotenv import load_dotenv
-
-# LLM (Gemini) via LangChain
-from langchain_google_genai import ChatGoogleGenerativeAI
 
 
 # -------------------------
 # Setup: Secrets & LLM
 # -------------------------
-def get_llm():
+LLM_CACHE_PATH = ".langchain_cache.db"
+
+# Short, low-stakes outputs (tips, cheat sheet) go to the smaller, faster model.
+LLM_MODELS = {
+    "simple": "gemini-1.5-flash-8b",
+    "complex": "gemini-1.5-flash",
+}
+
+
+@st.cache_resource
+def init_llm_cache():
+    """
+    Installs a global SQLite-backed LangChain cache so identical prompts are
+    answered from disk instead of re-hitting the Gemini API.
+    """
+    from langchain_community.cache import SQLiteCache
+    from langchain_core.globals import set_llm_cache
+
+    cache = SQLiteCache(database_path=LLM_CACHE_PATH)
+    set_llm_cache(cache)
+    return cache
+
+
+@st.cache_resource
+def get_llm(task: str = "complex", max_output_tokens: int = 1024):
     """
-    Loads GOOGLE_API_KEY from .env or Streamlit secrets and returns a Gemini LLM.
+    Loads GOOGLE_API_KEY from .env or Streamlit secrets and returns a Gemini LLM
+    for the given task ("simple" or "complex"), capped at max_output_tokens.
+    Cached as a resource so each client is built once, not on every rerun.
     """
+    # Imported here, and get_llm is only called from the Generate handlers, so
+    # the heavy LangChain/Google stack isn't loaded before the first page render.
+    from dotenv import load_dotenv
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    init_llm_cache()
     load_dotenv(override=False)
     api_key = os.getenv("GOOGLE_API_KEY") or st.secrets.get("GOOGLE_API_KEY", None)
     if not api_key:
         st.stop()  # Stop rendering and show a clear error
     return ChatGoogleGenerativeAI(
-        model="gemini-1.5-flash",
+        model=LLM_MODELS[task],
         temperature=0.7,
-        google_api_key=api_key
+        max_output_tokens=max_output_tokens,
+        google_api_key=api_key,
+        # Explicit pin of the SDK's default transport; connection reuse comes
+        # from the client itself being a cached resource.
+        transport="grpc",
     )
 
 
-llm = get_llm()
-
 st.set_page_config(page_title="Study bot", page_icon="🧭", layout="wide")
 st.title("🧭 Study bot")
 st.caption("AI tools for resumes, interviews, and daily productivity — powered by Gemini.")
 
 
+# =========================
+# Prompts
+# =========================
+# Stable instructions live in system messages and only user fields go in the
+# human message, keeping each task's instructions identical across requests.
+SYSTEM_RESUME = """
+You are a resume writer. Write an ATS-friendly resume draft in Markdown.
+Return exactly these sections, in order:
+1. `# Name` and one contact line
+2. `## Summary` (3 lines)
+3. `## Skills & Tools` (grouped)
+4. `## Experience` (achievement bullets with metrics; bold company/role)
+5. `## Projects` (1–2 bullets; invent plausible ones if none given)
+6. `## Education`
+7. `## Certifications` (suggest some if none given)
+No tables. Fit on one page.
+""".strip()
+
+SYSTEM_INTERVIEW = """
+You are a hiring manager preparing an interview for the role, difficulty and job description given.
+Return Markdown with exactly:
+1. `## Technical`: exactly 6 numbered questions, each with a model answer of at most 80 words
+2. `## Behavioral`: exactly 3 numbered questions, each with a STAR model answer of at most 80 words
+""".strip()
+
+SYSTEM_CHEAT_SHEET = """
+You are a hiring manager preparing an interview for the role, difficulty and job description given.
+Return a Markdown bullet list of at most 10 topics to revise. No introduction.
+""".strip()
+
+SYSTEM_TIPS = """
+You are a productivity coach. Given the user's tasks and schedule window,
+return exactly 5 one-sentence Markdown bullets on focus, batching, and breaks.
+""".strip()
+
+
+def build_messages(system: str, human: str) -> List[Tuple[str, str]]:
+    return [("system", system), ("human", human.strip())]
+
+
 # =========================
 # Helpers
 # =========================
-def safe_split_list(s: str) -> List[str]:
-    return [x.strip() for x in s.split(",") if x.strip()]
+def canonical_csv(s: str) -> str:
+    """
+    Normalizes a comma-separated field into a single ", "-joined string,
+    dropping blanks and case-insensitive duplicates (keeping the user's order)
+    so "Python, SQL, python" and "Python,SQL" build the same prompt (and
+    therefore hit the same LLM cache entry).
+    """
+    seen = {}
+    for x in s.split(","):
+        x = x.strip()
+        if x and x.lower() not in seen:
+            seen[x.lower()] = x
+    return ", ".join(seen.values())
+
+def normalize_block(s: str) -> str:
+    """
+    Strips trailing whitespace and drops blank lines so whitespace-only edits
+    to free-text fields don't produce a new cache key. Leading indentation is
+    kept so nested bullets survive.
+    """
+    return "\n".join(line.rstrip() for line in s.splitlines() if line.strip())
+
+def stream_markdown(llm, messages) -> str:
+    """
+    Streams the LLM reply into the page token-by-token and returns the full text.
+    llm.stream() bypasses the global LLM cache, so it is consulted and filled
+    here, keyed on the messages and the client's model settings.
+    """
+    from langchain_core.globals import get_llm_cache
+    from langchain_core.load import dumps
+    from langchain_core.messages import AIMessage, convert_to_messages
+    from langchain_core.outputs import ChatGeneration
+
+    cache = get_llm_cache()
+    prompt = dumps(convert_to_messages(messages))
+    llm_string = repr((llm.model, llm.temperature, llm.max_output_tokens))
+    cached = cache.lookup(prompt, llm_string) if cache else None
+    if cached:
+        text = cached[0].text
+        st.markdown(text)
+        return text
+
+    text = st.write_stream(chunk.content for chunk in llm.stream(messages))
+    if cache:
+        cache.update(prompt, llm_string, [ChatGeneration(message=AIMessage(content=text))])
+    return text
+
+@st.cache_resource
+def _get_docx_cls():
+    from docx import Document
+    return Document
 
 def to_docx_bytes(plain_text: str) -> bytes:
     """
     Creates a simple .docx file from plain text.
+    Consecutive non-empty lines share one paragraph (joined with line breaks);
+    blank lines start a new one.
     (Keeps it dependency-light: uses python-docx if present, else falls back to .txt bytes)
     """
     try:
-        from docx import Document
-        doc = Document()
+        doc = _get_docx_cls()()
+        block = []
         for line in plain_text.splitlines():
-            doc.add_paragraph(line)
+            if line.strip():
+                block.append(line)
+            elif block:
+                doc.add_paragraph("\n".join(block))
+                block = []
+        if block:
+            doc.add_paragraph("\n".join(block))
         buf = io.BytesIO()
         doc.save(buf)
-        buf.seek(0)
-        return buf.read()
+        return buf.getvalue()
     except Exception:
         # Fallback: return text bytes (user can still download as .txt)
         return plain_text.encode("utf-8")
 
 
-def parse_task_line(line: str) -> Tuple[str, int, str, str]:
+def hhmm_to_minutes(hhmm: str) -> int:
+    """
+    Converts "HH:MM" (24h) to minutes since midnight. Raises ValueError if invalid.
+    """
+    h, m = map(int, hhmm.strip().split(":"))
+    if not (0 <= h < 24 and 0 <= m < 60):
+        raise ValueError(f"Invalid time: {hhmm!r}")
+    return h * 60 + m
+
+
+def minutes_to_hhmm(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def parse_task_line(line: str) -> Tuple[str, int, str, Optional[int]]:
     """
     Parse a task line like:
         Task name, 60, H, 15:30
-    -> (name, duration_minutes, priority, deadlineHHMM or "")
+    -> (name, duration_minutes, priority, deadline_minutes or None)
     Priority: H/M/L
-    Deadline is optional ('' if missing)
+    Deadline is optional (None if missing or not a valid HH:MM)
     """
     parts = [p.strip() for p in line.split(",")]
     name = parts[0] if parts else "Task"
     duration = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 60
     priority = parts[2].upper() if len(parts) > 2 else "M"
-    deadline = parts[3] if len(parts) > 3 else ""
+    try:
+        deadline = hhmm_to_minutes(parts[3]) if len(parts) > 3 else None
+    except ValueError:
+        deadline = None
     return name, duration, priority, deadline
 
 
+@st.cache_data
+def parse_tasks(tasks_raw: str) -> List[Tuple[str, int, str, Optional[int]]]:
+    """
+    Parses the planner text area, one task per non-empty line.
+    Cached on the raw text, so it only re-runs when the user edits the tasks.
+    """
+    return [parse_task_line(l) for l in tasks_raw.splitlines() if l.strip()]
+
+
+@st.cache_data
+def invalid_deadline_lines(tasks_raw: str) -> List[str]:
+    """
+    Task lines whose deadline is given but isn't a valid HH:MM, so the user
+    can be told it was ignored.
+    """
+    bad = []
+    for line in tasks_raw.splitlines():
+        parts = [p.strip() for p in line.split(",")]
+        if len(parts) > 3 and parts[3]:
+            try:
+                hhmm_to_minutes(parts[3])
+            except ValueError:
+                bad.append(line.strip())
+    return bad
+
+
 def schedule_tasks(
-    tasks: List[Tuple[str, int, str, str]],
+    tasks: List[Tuple[str, int, str, Optional[int]]],
     work_start: str,
     work_end: str
 ):
@@ -86,49 +256,79 @@ def schedule_tasks(
     - Sort by (deadline present, deadline time), then priority H > M > L
     - Greedy place tasks in the day from start time until end
     """
+    import numpy as np
+
     pri_order = {"H": 0, "M": 1, "L": 2}
 
-    def deadline_key(dl: str):
-        if not dl:
-            return (1, "23:59")
-        return (0, dl)
+    # One int per task: deadline minutes in the high bits, priority in the low
+    # two. Tasks without a deadline get 24:00, after every real deadline.
+    no_deadline = 24 * 60
+    keyed = [
+        (((no_deadline if t[3] is None else t[3]) << 2) | pri_order.get(t[2], 1), t)
+        for t in tasks
+    ]
+    tasks_sorted = [t for _, t in sorted(keyed, key=itemgetter(0))]
+
+    current = hhmm_to_minutes(work_start)
+    end_min = hhmm_to_minutes(work_end)
+
+    n = len(tasks_sorted)
+    durations = np.fromiter((t[1] for t in tasks_sorted), dtype=np.int64, count=n)
+    ends = np.full(n, -1, dtype=np.int64)
+
+    # Place each run of tasks that fits with one cumulative sum; the task that
+    # overflows is skipped and the next run starts from the same time.
+    i = 0
+    while i < n:
+        run_ends = current + np.cumsum(durations[i:])
+        fit = int(np.searchsorted(run_ends, end_min, side="right"))
+        ends[i:i + fit] = run_ends[:fit]
+        if fit:
+            current = int(run_ends[fit - 1])
+        i += fit + 1
+    starts = ends - durations
+
+    return [
+        {
+            "Task": name,
+            "Priority": pri,
+            "Start": minutes_to_hhmm(start),
+            "End": minutes_to_hhmm(end),
+            "Deadline": "—" if dl is None else minutes_to_hhmm(dl)
+        } if end >= 0 else {
+            "Task": f"{name} (Overflow)",
+            "Priority": pri,
+            "Start": "—",
+            "End": "—",
+            "Deadline": "—" if dl is None else minutes_to_hhmm(dl)
+        }
+        for (name, _, pri, dl), start, end in zip(tasks_sorted, starts.tolist(), ends.tolist())
+    ]
+
+
+@st.cache_data
+def schedule_dataframe(
+    tasks: List[Tuple[str, int, str, Optional[int]]],
+    work_start: str,
+    work_end: str
+) -> "pd.DataFrame":
+    """
+    The schedule as a ready-to-render DataFrame, cached on the same inputs.
+    """
+    import pandas as pd
 
-    tasks_sorted = sorted(
-        tasks,
-        key=lambda t: (deadline_key(t[3]), pri_order.get(t[2], 1))
+    return pd.DataFrame(
+        schedule_tasks(tasks, work_start, work_end),
+        columns=["Task", "Priority", "Start", "End", "Deadline"]
     )
 
-    today = datetime.now().date()
-    start_dt = datetime.combine(today, datetime.strptime(work_start, "%H:%M").time())
-    end_dt = datetime.combine(today, datetime.strptime(work_end, "%H:%M").time())
-    current = start_dt
-
-    schedule = []
-    for name, dur, pri, dl in tasks_sorted:
-        task_end = current + timedelta(minutes=dur)
-        if task_end <= end_dt:
-            schedule.append({
-                "Task": name,
-                "Priority": pri,
-                "Start": current.strftime("%H:%M"),
-                "End": task_end.strftime("%H:%M"),
-                "Deadline": dl or "—"
-            })
-            current = task_end
-        else:
-            schedule.append({
-                "Task": f"{name} (Overflow)",
-                "Priority": pri,
-                "Start": "—",
-                "End": "—",
-                "Deadline": dl or "—"
-            })
-    return schedule
-
 
 # =========================
 # Tabs
 # =========================
+# Below this the JD is too thin to tailor questions to, so skip the LLM call.
+MIN_JD_CHARS = 50
+
 tab1, tab2, tab3 = st.tabs(["📄 Resume Builder", "🗣️ Interview Q&A", "🗓️ Daily Planner"])
 
 
@@ -158,13 +358,16 @@ with tab1:
     st.markdown("**Education (optional)** — bullet points (one per line)")
     edu = st.text_area("Education points", height=100, placeholder="B.Tech in CSE — XYZ University (2022)")
 
-    if st.button("Generate Resume"):
-        skill_list = safe_split_list(skills)
-        tool_list = safe_split_list(tools)
+    generate_resume = st.button("Generate Resume")
+    if generate_resume and not (name.strip() and role.strip()):
+        st.warning("Please enter at least your full name and target role.")
+        generate_resume = False
 
-        prompt = f"""
-You are an expert resume writer. Create an ATS-friendly resume draft in clean Markdown.
-Use crisp, achievement-oriented bullets with metrics where possible.
+    if generate_resume:
+        skills_joined = canonical_csv(skills)
+        tools_joined = canonical_csv(tools)
+
+        messages = build_messages(SYSTEM_RESUME, f"""
 Style: {summary_pref}. Target role: {role}. Years of experience: {years_exp}.
 
 Candidate:
@@ -172,39 +375,34 @@ Candidate:
 - Email: {email}
 - Phone: {phone}
 - Location: {location}
-- Skills: {", ".join(skill_list)}
-- Tools/Tech: {", ".join(tool_list)}
+- Skills: {skills_joined}
+- Tools/Tech: {tools_joined}
 - Industry focus: {industries or "General"}
 
 Experience points (raw, optional):
-{exp or "N/A"}
+{normalize_block(exp) or "N/A"}
 
 Education points (raw, optional):
-{edu or "N/A"}
-
-Output sections in this order:
-1) Name & Contact (single header line)
-2) Professional Summary (3–5 lines)
-3) Skills & Tools (grouped)
-4) Experience (bullet points)
-5) Projects (add 1–2 plausible project bullets if none provided)
-6) Education
-7) Certifications (add suggests if none)
-
-Keep it scannable. Avoid tables. Use bold for company/role. Limit to ~1 page.
-"""
-        result = llm.invoke(prompt)
-        md = result.content.strip()
-
+{normalize_block(edu) or "N/A"}
+""")
         st.markdown("### ✅ Resume Draft")
-        st.markdown(md)
+        st.session_state["resume_md"] = stream_markdown(get_llm("complex", max_output_tokens=1200), messages).strip()
+        st.session_state.pop("resume_docx", None)
+    elif "resume_md" in st.session_state:
+        st.markdown("### ✅ Resume Draft")
+        st.markdown(st.session_state["resume_md"])
 
-        # Downloads
+    # Downloads (the draft lives in session state so it survives the reruns
+    # triggered by these buttons; .docx is only built when asked for)
+    md = st.session_state.get("resume_md")
+    if md:
         st.download_button("⬇️ Download as Markdown (.md)", md.encode("utf-8"),
                            file_name="resume_draft.md", mime="text/markdown")
-        docx_bytes = to_docx_bytes(md)
-        st.download_button("⬇️ Download as Word (.docx)", docx_bytes,
-                           file_name="resume_draft.docx", mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+        if st.button("📝 Prepare Word (.docx)"):
+            st.session_state["resume_docx"] = to_docx_bytes(md)
+        if "resume_docx" in st.session_state:
+            st.download_button("⬇️ Download as Word (.docx)", st.session_state["resume_docx"],
+                               file_name="resume_draft.docx", mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
 
 
 # -------------------------
@@ -216,30 +414,43 @@ with tab2:
     role_type = st.selectbox("Role", ["Data Scientist", "Backend Engineer", "ML Engineer", "Product Manager", "DevOps"])
     difficulty = st.select_slider("Difficulty", options=["Easy", "Medium", "Hard"], value="Medium")
     jd = st.text_area("Paste the Job Description (JD)", height=220)
+    st.caption(f"{len(jd.strip())}/{MIN_JD_CHARS} characters minimum")
+
+    generate_qa = st.button("Generate Questions & Model Answers")
+    if generate_qa and len(jd.strip()) < MIN_JD_CHARS:
+        st.warning(f"Please paste a job description of at least {MIN_JD_CHARS} characters.")
+        generate_qa = False
 
-    if st.button("Generate Questions & Model Answers"):
-        prompt = f"""
-You are a hiring manager preparing an interview.
+    if generate_qa:
+        interview_fields = f"""
 Role: {role_type}
 Difficulty: {difficulty}
 
 Job Description:
-{jd}
-
-Generate:
-- ~8 technical questions with model answers
-- ~5 behavioral questions with STAR-structured model answers
-- A short role-specific cheat sheet (bullet list of topics to revise)
-
-Format clearly in Markdown with headings and numbered lists.
-Keep answers concise but high quality.
+{normalize_block(jd)}
 """
-        result = llm.invoke(prompt)
+        # The cheat sheet is independent of the Q&A, so fetch it in the
+        # background while the Q&A streams instead of paying for both serially.
+        llm_small = get_llm("simple", max_output_tokens=512)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            cheat_future = pool.submit(llm_small.invoke, build_messages(SYSTEM_CHEAT_SHEET, interview_fields))
+            st.markdown("### ✅ Interview Pack")
+            qa_md = stream_markdown(get_llm("complex", max_output_tokens=2048), build_messages(SYSTEM_INTERVIEW, interview_fields))
+            cheat_md = cheat_future.result().content.strip()
+        st.session_state["interview_qa_md"] = qa_md
+        st.session_state["interview_cheat_md"] = cheat_md
+    elif "interview_qa_md" in st.session_state:
         st.markdown("### ✅ Interview Pack")
-        st.markdown(result.content)
+        st.markdown(st.session_state["interview_qa_md"])
+
+    if "interview_qa_md" in st.session_state:
+        qa_md = st.session_state["interview_qa_md"]
+        cheat_md = st.session_state["interview_cheat_md"]
+        st.markdown("#### 📌 Cheat Sheet")
+        st.markdown(cheat_md)
 
         st.download_button("⬇️ Download Q&A (.md)",
-                           result.content.encode("utf-8"),
+                           f"{qa_md}\n\n## Cheat Sheet\n\n{cheat_md}".encode("utf-8"),
                            file_name="interview_qa.md",
                            mime="text/markdown")
 
@@ -261,24 +472,36 @@ with tab3:
         work_end = st.text_input("Work end (24h)", value="18:00")
 
     if st.button("Generate Schedule"):
-        lines = [l for l in tasks_raw.splitlines() if l.strip()]
-        tasks = [parse_task_line(l) for l in lines] if lines else []
+        tasks = parse_tasks(tasks_raw)
         if not tasks:
+            st.session_state.pop("schedule", None)
+            st.session_state.pop("tips_md", None)
             st.warning("Please enter at least one task.")
         else:
-            schedule = schedule_tasks(tasks, work_start, work_end)
+            schedule = schedule_dataframe(tasks, work_start, work_end)
+            st.session_state["schedule"] = schedule
+            st.session_state.pop("tips_md", None)
+            bad_deadlines = invalid_deadline_lines(tasks_raw)
+            if bad_deadlines:
+                st.warning(
+                    "Ignored deadlines that aren't HH:MM (24h) for: "
+                    + "; ".join(f"`{l}`" for l in bad_deadlines)
+                )
             st.markdown("### ✅ Suggested Schedule")
-            st.dataframe(schedule, use_container_width=True)
+            st.dataframe(schedule, use_container_width=True, hide_index=True)
 
             # Also ask Gemini for short productivity tips based on tasks
-            task_list_str = "\n".join([f"- {t[0]} ({t[1]}m, {t[2]}, deadline {t[3] or '—'})" for t in tasks])
-            tip_prompt = f"""
-You are a productivity coach. Given these tasks and schedule window {work_start}-{work_end},
-suggest 5 short tips (bullet points) to improve focus, batching, and breaks.
+            task_list_str = "\n".join([f"- {t[0]} ({t[1]}m, {t[2]}, deadline {'—' if t[3] is None else minutes_to_hhmm(t[3])})" for t in tasks])
+            tip_messages = build_messages(SYSTEM_TIPS, f"""
+Schedule window: {work_start}-{work_end}
 
 Tasks:
 {task_list_str}
-"""
-            tips = llm.invoke(tip_prompt).content
+""")
             st.markdown("#### 💡 Tips to Work Smarter")
-            st.markdown(tips)
+            st.session_state["tips_md"] = stream_markdown(get_llm("simple", max_output_tokens=512), tip_messages)
+    elif "schedule" in st.session_state:
+        st.markdown("### ✅ Suggested Schedule")
+        st.dataframe(st.session_state["schedule"], use_container_width=True, hide_index=True)
+        st.markdown("#### 💡 Tips to Work Smarter")
+        st.markdown(st.session_state.get("tips_md", ""))